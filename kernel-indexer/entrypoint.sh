@@ -9,6 +9,7 @@ EXIT_KERNEL_ROOT_INVALID=3
 EXIT_INDEX_FAILED=4
 EXIT_COLLATE_FAILED=5
 EXIT_CATALOG_UPDATE_FAILED=6
+EXIT_STATIC_EXPORT_FAILED=7
 
 # Default configuration
 DEFAULT_KERNEL_ROOT="/sw/icrn/jupyter/icrn_ncsa_resources/Kernels"
@@ -20,6 +21,9 @@ OUTPUT_DIR="${OUTPUT_DIR:-${KERNEL_ROOT}}"
 LANGUAGE_FILTER="${LANGUAGE_FILTER:-}"
 LOG_LEVEL="${LOG_LEVEL:-INFO}"
 ATOMIC_WRITES="${ATOMIC_WRITES:-true}"
+# Root of the precompiled static API tree served by nginx (empty disables export)
+STATIC_API_ROOT="${STATIC_API_ROOT:-}"
+STATIC_EXPORT_SCRIPT="${STATIC_EXPORT_SCRIPT:-/app/static_export.py}"
 
 # Logging function
 log() {
@@ -416,6 +420,25 @@ main() {
         exit $EXIT_CATALOG_UPDATE_FAILED
     fi
     
+    # Execute static API export phase (optional)
+    if [ -n "${STATIC_API_ROOT}" ]; then
+        log_info "Starting static API export phase..."
+        log_info "STATIC_API_ROOT: ${STATIC_API_ROOT}"
+        
+        if python "${STATIC_EXPORT_SCRIPT}" \
+            --collated-manifests "${collated_manifests}" \
+            --package-index "${package_index}" \
+            --output-root "${STATIC_API_ROOT}"; then
+            log_info "Static API export phase completed successfully"
+        else
+            local exit_code=$?
+            log_error "Static API export phase failed with exit code: ${exit_code}"
+            exit $EXIT_STATIC_EXPORT_FAILED
+        fi
+    else
+        log_debug "STATIC_API_ROOT not set, skipping static API export"
+    fi
+    
     log_info "Kernel indexing completed successfully"
     exit $EXIT_SUCCESS
 }
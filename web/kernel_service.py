@@ -12,16 +12,33 @@ from pathlib import Path
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 import uvicorn
 
+from static_export import (
+    build_languages,
+    build_kernels_for_language,
+    find_kernel,
+    build_kernel_details,
+    build_kernel_manifest,
+    find_package,
+    build_package_info,
+    build_package_search,
+    export_static_api,
+    source_fingerprint,
+)
+
 app = FastAPI(title="ICRN Kernel Manager API", version="1.0.0")
 
 # Configuration
 COLLATED_MANIFESTS_PATH = os.getenv("COLLATED_MANIFESTS_PATH", "/app/data/collated_manifests.json")
 PACKAGE_INDEX_PATH = os.getenv("PACKAGE_INDEX_PATH", "/app/data/package_index.json")
 KERNEL_ROOT = os.getenv("KERNEL_ROOT", "/app/data")
+# Root of the precompiled static API tree served by nginx. Disabled by default;
+# set it where nginx mounts the same volume (e.g. /app/static_api)
+STATIC_API_ROOT = os.getenv("STATIC_API_ROOT", "")
 STATIC_DIR = Path("/app/static")
 DATA_DIR = Path(COLLATED_MANIFESTS_PATH).parent
 DATA_DIR.mkdir(parents=True, exist_ok=True)
@@ -34,6 +51,7 @@ if STATIC_DIR.exists():
 collated_manifests: Optional[Dict[str, Any]] = None
 package_index: Optional[Dict[str, Any]] = None
 last_refresh_time: Optional[datetime] = None
+loaded_fingerprint: Optional[str] = None
 refresh_lock = threading.Lock()
 
 
@@ -44,10 +62,16 @@ def load_data_files() -> bool:
     This function ONLY reads existing JSON files - it does NOT trigger indexing or collation.
     Returns True if both files loaded successfully, raises exception otherwise.
     """
-    global collated_manifests, package_index, last_refresh_time
+    global collated_manifests, package_index, last_refresh_time, loaded_fingerprint
     
     errors = []
     
+    # Fingerprint the files before reading them so a later change always yields a new fingerprint
+    try:
+        fingerprint = source_fingerprint(COLLATED_MANIFESTS_PATH, PACKAGE_INDEX_PATH)
+    except OSError:
+        fingerprint = None
+    
     # Load collated_manifests.json (required)
     if not os.path.exists(COLLATED_MANIFESTS_PATH):
         errors.append(f"Required file not found: {COLLATED_MANIFESTS_PATH}")
@@ -90,17 +114,44 @@ def load_data_files() -> bool:
         print(f"ERROR: {error_msg}")
         collated_manifests = None
         package_index = None
+        loaded_fingerprint = None
         raise RuntimeError(error_msg)
     
+    loaded_fingerprint = fingerprint
     last_refresh_time = datetime.now()
     return True
 
 
+def export_static_tree() -> None:
+    """
+    Render every cacheable API response to the static tree under STATIC_API_ROOT
+    so nginx can serve read traffic without reaching Python.
+    Only the currently loaded data is used; the export is skipped if the tree
+    was already built from the same data files. Failures are logged, not raised,
+    since FastAPI still serves every route.
+    """
+    if not STATIC_API_ROOT:
+        return
+    # load_data_files publishes these one at a time under refresh_lock, so read them
+    # under the same lock to never export one data set under another's fingerprint
+    with refresh_lock:
+        manifests, packages, release_name = collated_manifests, package_index, loaded_fingerprint
+    if manifests is None or packages is None or release_name is None:
+        return
+    try:
+        if not export_static_api(STATIC_API_ROOT, manifests, packages, release_name):
+            print(f"Static API tree already current: {release_name}")
+    except Exception as e:
+        print(f"WARNING: Static API export to {STATIC_API_ROOT} failed: {e}")
+
+
 def refresh_data_periodically():
     """
     Background thread that reloads the data files from disk every hour.
     This only reads existing files - it does NOT trigger indexing or collation.
+    The static API tree is exported here first, so startup does not wait on it.
     """
+    export_static_tree()
     while True:
         time.sleep(3600)  # Wait 1 hour
         print("Hourly reload triggered - reading data files from disk...")
@@ -109,6 +160,8 @@ def refresh_data_periodically():
                 load_data_files()
             except RuntimeError as e:
                 print(f"ERROR during reload: {e}")
+                continue
+        export_static_tree()
 
 
 @app.on_event("startup")
@@ -128,7 +181,7 @@ async def startup_event():
     # Start background thread for periodic reload (reads files from disk only)
     refresh_thread = threading.Thread(target=refresh_data_periodically, daemon=True)
     refresh_thread.start()
-    print("Background reload thread started (reads files from disk every hour, no indexing)")
+    print("Background reload thread started (exports static API tree, then reads files from disk every hour, no indexing)")
 
 
 @app.get("/")
@@ -172,17 +225,11 @@ async def get_languages():
         if collated_manifests is None:
             raise HTTPException(status_code=503, detail="Collated manifests not loaded")
         
-        languages = set()
-        # Extract unique languages from collated manifests
-        for kernel in collated_manifests.get("kernels", []):
-            lang = kernel.get("language")
-            if lang:
-                languages.add(lang)
-        
-        if not languages:
+        content = build_languages(collated_manifests)
+        if content is None:
             raise HTTPException(status_code=503, detail="No languages found in data")
         
-        return JSONResponse(content={"languages": sorted(list(languages))})
+        return JSONResponse(content=content)
 
 
 @app.get("/api/kernels/{language}")
@@ -194,27 +241,11 @@ async def get_kernels_for_language(language: str):
         if collated_manifests is None:
             raise HTTPException(status_code=503, detail="Collated manifests not loaded")
         
-        kernels_dict = {}  # kernel_name -> set of versions
-        
-        # Extract kernels from collated manifests
-        for kernel in collated_manifests.get("kernels", []):
-            if kernel.get("language") == language:
-                kernel_name = kernel.get("kernel_name")
-                kernel_version = kernel.get("kernel_version")
-                if kernel_name and kernel_version:
-                    if kernel_name not in kernels_dict:
-                        kernels_dict[kernel_name] = set()
-                    kernels_dict[kernel_name].add(kernel_version)
-        
-        if not kernels_dict:
+        content = build_kernels_for_language(collated_manifests, language)
+        if content is None:
             raise HTTPException(status_code=404, detail=f"Language '{language}' not found or has no kernels")
         
-        kernels = [
-            {"name": name, "versions": sorted(list(versions))}
-            for name, versions in kernels_dict.items()
-        ]
-        
-        return JSONResponse(content={"language": language, "kernels": kernels})
+        return JSONResponse(content=content)
 
 
 @app.get("/api/kernel/{language}/{kernel_name}/{version}")
@@ -226,20 +257,9 @@ async def get_kernel_details(language: str, kernel_name: str, version: str):
         if collated_manifests is None:
             raise HTTPException(status_code=503, detail="Collated manifests not loaded")
         
-        # Find kernel in collated manifests
-        for kernel in collated_manifests.get("kernels", []):
-            if (kernel.get("language") == language and
-                kernel.get("kernel_name") == kernel_name and
-                kernel.get("kernel_version") == version):
-                return JSONResponse(content={
-                    "language": language,
-                    "kernel_name": kernel_name,
-                    "version": version,
-                    "language_version": kernel.get("language_version", ""),
-                    "package_count": kernel.get("package_count", 0),
-                    "manifest_path": kernel.get("manifest_path", ""),
-                    "indexed_date": kernel.get("indexed_date", "")
-                })
+        kernel = find_kernel(collated_manifests, language, kernel_name, version)
+        if kernel is not None:
+            return JSONResponse(content=build_kernel_details(kernel))
         
         raise HTTPException(
             status_code=404,
@@ -257,20 +277,9 @@ async def get_kernel_manifest(language: str, kernel_name: str, version: str):
             raise HTTPException(status_code=503, detail="Collated manifests not loaded")
         
         # Find kernel in collated manifests - packages are already included
-        for kernel in collated_manifests.get("kernels", []):
-            if (kernel.get("language") == language and
-                kernel.get("kernel_name") == kernel_name and
-                kernel.get("kernel_version") == version):
-                # Return manifest structure with packages
-                manifest_data = {
-                    "kernel_name": kernel.get("kernel_name"),
-                    "kernel_version": kernel.get("kernel_version"),
-                    "language": kernel.get("language"),
-                    "language_version": kernel.get("language_version"),
-                    "indexed_date": kernel.get("indexed_date"),
-                    "packages": kernel.get("packages", [])
-                }
-                return JSONResponse(content=manifest_data)
+        kernel = find_kernel(collated_manifests, language, kernel_name, version)
+        if kernel is not None:
+            return JSONResponse(content=build_kernel_manifest(kernel))
         
         raise HTTPException(
             status_code=404,
@@ -291,14 +300,9 @@ async def get_package_info(package_name: str):
                 detail="Package index not loaded"
             )
         
-        # Search for package in package index
-        for package in package_index.get("packages", []):
-            if package.get("name") == package_name:
-                return JSONResponse(content={
-                    "name": package.get("name"),
-                    "kernel_count": package.get("kernel_count", 0),
-                    "kernels": package.get("kernels", [])
-                })
+        package = find_package(package_index, package_name)
+        if package is not None:
+            return JSONResponse(content=build_package_info(package))
         
         raise HTTPException(
             status_code=404,
@@ -319,42 +323,28 @@ async def search_packages(query: str = ""):
                 detail="Package index not loaded"
             )
         
-        query_lower = query.lower()
-        matching_packages = []
-        
-        for package in package_index.get("packages", []):
-            package_name = package.get("name", "")
-            if query_lower in package_name.lower():
-                matching_packages.append({
-                    "name": package_name,
-                    "kernel_count": package.get("kernel_count", 0),
-                    "kernels": package.get("kernels", [])
-                })
-        
-        return JSONResponse(content={
-            "query": query,
-            "total_matches": len(matching_packages),
-            "packages": matching_packages
-        })
+        return JSONResponse(content=build_package_search(package_index, query))
 
 
 @app.post("/api/refresh")
 async def manual_refresh():
     """
-    Manually trigger a reload of the data files from disk.
+    Manually trigger a reload of the data files from disk and re-export the static API tree.
     This only reads existing JSON files - it does NOT trigger indexing or collation.
     Indexing must be performed separately using the kernel_indexer tool.
     """
     with refresh_lock:
         try:
             load_data_files()
-            return {
-                "status": "reloaded",
-                "message": "Data files reloaded from disk (no indexing performed)",
-                "last_refresh": last_refresh_time.isoformat() if last_refresh_time else None
-            }
         except RuntimeError as e:
             raise HTTPException(status_code=500, detail=str(e))
+    # Export in a worker thread so the event loop keeps serving requests
+    await run_in_threadpool(export_static_tree)
+    return {
+        "status": "reloaded",
+        "message": "Data files reloaded from disk (no indexing performed)",
+        "last_refresh": last_refresh_time.isoformat() if last_refresh_time else None
+    }
 
 
 if __name__ == "__main__":
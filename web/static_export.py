@@ -0,0 +1,422 @@
+"""
+Static export of the ICRN Kernel Manager API.
+
+Every cacheable API response is derived from collated_manifests.json and
+package_index.json, so it can be rendered ahead of time to a file tree that
+nginx serves directly (see nginx.conf). The response builders in this module
+are also used by kernel_service.py, so the exported files are byte-identical
+to what FastAPI would return.
+
+Tree layout under the output root:
+
+    releases/<fingerprint>/api/languages.json
+    releases/<fingerprint>/api/kernels/{language}.json
+    releases/<fingerprint>/api/kernel/{language}/{kernel_name}/{version}.json
+    releases/<fingerprint>/api/manifest/{language}/{kernel_name}/{version}.json
+    releases/<fingerprint>/api/package/{package_name}.json
+    releases/<fingerprint>/api/packages/search/{query}.json   (prefixes of package names)
+    releases/<fingerprint>/api/packages/search/@all.json      (empty query)
+    current -> releases/<fingerprint>
+
+Each .json file has a precompressed .json.gz sibling. A new release is built
+completely before the "current" symlink is flipped to it with an atomic rename.
+
+This module uses only the standard library so the kernel indexer image can
+run it after collation:
+
+    python static_export.py --collated-manifests /path/collated_manifests.json \\
+        --package-index /path/package_index.json --output-root /path/static_api
+"""
+import argparse
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import string
+import sys
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Iterator, Tuple
+
+# Broad queries matching more packages than this are left to FastAPI, so the whole
+# index is not repeated across many short-prefix shards
+MAX_SEARCH_SHARD_MATCHES = 50
+# Number of releases kept on disk (including current) so in-flight reads of the
+# previous tree are not cut off by the flip
+DEFAULT_KEEP_RELEASES = 2
+# Characters allowed in exported search shard names; must match the map in nginx.conf
+SEARCH_SHARD_FIRST_CHARS = string.ascii_lowercase + string.digits + "_-"
+SEARCH_SHARD_CHARS = SEARCH_SHARD_FIRST_CHARS + "."
+# Shard for the empty query; "@" is outside the shard alphabet so no query can collide with it
+SEARCH_ALL_SHARD = "@all"
+
+CURRENT_LINK = "current"
+RELEASES_DIR = "releases"
+LOCK_FILE = ".export.lock"
+
+
+# ---------------------------------------------------------------------------
+# Response builders (shared with kernel_service.py)
+# ---------------------------------------------------------------------------
+
+def render_json(content: Any) -> bytes:
+    """
+    Serialize a response body exactly as FastAPI's JSONResponse does.
+    """
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def build_languages(collated_manifests: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Build the /api/languages response. Returns None if no languages are present.
+    """
+    languages = set()
+    for kernel in collated_manifests.get("kernels", []):
+        lang = kernel.get("language")
+        if lang:
+            languages.add(lang)
+
+    if not languages:
+        return None
+
+    return {"languages": sorted(list(languages))}
+
+
+def build_kernels_for_language(collated_manifests: Dict[str, Any], language: str) -> Optional[Dict[str, Any]]:
+    """
+    Build the /api/kernels/{language} response. Returns None if the language has no kernels.
+    """
+    kernels_dict = {}  # kernel_name -> set of versions
+
+    for kernel in collated_manifests.get("kernels", []):
+        if kernel.get("language") == language:
+            kernel_name = kernel.get("kernel_name")
+            kernel_version = kernel.get("kernel_version")
+            if kernel_name and kernel_version:
+                if kernel_name not in kernels_dict:
+                    kernels_dict[kernel_name] = set()
+                kernels_dict[kernel_name].add(kernel_version)
+
+    if not kernels_dict:
+        return None
+
+    kernels = [
+        {"name": name, "versions": sorted(list(versions))}
+        for name, versions in kernels_dict.items()
+    ]
+
+    return {"language": language, "kernels": kernels}
+
+
+def find_kernel(collated_manifests: Dict[str, Any], language: str, kernel_name: str, version: str) -> Optional[Dict[str, Any]]:
+    """
+    Return the first kernel entry matching language, name and version, or None.
+    """
+    for kernel in collated_manifests.get("kernels", []):
+        if (kernel.get("language") == language and
+            kernel.get("kernel_name") == kernel_name and
+            kernel.get("kernel_version") == version):
+            return kernel
+    return None
+
+
+def build_kernel_details(kernel: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the /api/kernel/{language}/{kernel_name}/{version} response for a kernel entry.
+    """
+    return {
+        "language": kernel.get("language"),
+        "kernel_name": kernel.get("kernel_name"),
+        "version": kernel.get("kernel_version"),
+        "language_version": kernel.get("language_version", ""),
+        "package_count": kernel.get("package_count", 0),
+        "manifest_path": kernel.get("manifest_path", ""),
+        "indexed_date": kernel.get("indexed_date", "")
+    }
+
+
+def build_kernel_manifest(kernel: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the /api/manifest/{language}/{kernel_name}/{version} response for a kernel entry.
+    """
+    return {
+        "kernel_name": kernel.get("kernel_name"),
+        "kernel_version": kernel.get("kernel_version"),
+        "language": kernel.get("language"),
+        "language_version": kernel.get("language_version"),
+        "indexed_date": kernel.get("indexed_date"),
+        "packages": kernel.get("packages", [])
+    }
+
+
+def find_package(package_index: Dict[str, Any], package_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Return the first package entry with the given name, or None.
+    """
+    for package in package_index.get("packages", []):
+        if package.get("name") == package_name:
+            return package
+    return None
+
+
+def build_package_info(package: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the /api/package/{package_name} response for a package entry.
+    """
+    return {
+        "name": package.get("name"),
+        "kernel_count": package.get("kernel_count", 0),
+        "kernels": package.get("kernels", [])
+    }
+
+
+def build_package_search(package_index: Dict[str, Any], query: str) -> Dict[str, Any]:
+    """
+    Build the /api/packages/search response (case-insensitive partial match on name).
+    """
+    query_lower = query.lower()
+    matching_packages = []
+
+    for package in package_index.get("packages", []):
+        package_name = package.get("name", "")
+        if query_lower in package_name.lower():
+            matching_packages.append({
+                "name": package_name,
+                "kernel_count": package.get("kernel_count", 0),
+                "kernels": package.get("kernels", [])
+            })
+
+    return {
+        "query": query,
+        "total_matches": len(matching_packages),
+        "packages": matching_packages
+    }
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+def is_safe_segment(segment: Any) -> bool:
+    """
+    Check that a value can be used as a single path component in the exported tree.
+    Entries that fail this check are not exported and are served by FastAPI instead.
+    """
+    return (
+        isinstance(segment, str) and
+        segment not in ("", ".", "..") and
+        not segment.startswith(".") and
+        "/" not in segment and
+        "\\" not in segment and
+        "\0" not in segment
+    )
+
+
+def iter_search_shards(package_index: Dict[str, Any]) -> Iterator[str]:
+    """
+    Yield every prefix of every lowercased package name that is made of shard
+    characters, so a full or partly typed package name hits a shard. Other queries
+    are left to FastAPI.
+    """
+    candidates = set()
+    for package in package_index.get("packages", []):
+        name = package.get("name", "").lower()
+        if not name or name[0] not in SEARCH_SHARD_FIRST_CHARS:
+            continue
+        for i, c in enumerate(name):
+            if c not in SEARCH_SHARD_CHARS:
+                break
+            candidates.add(name[:i + 1])
+    yield from sorted(candidates)
+
+
+def iter_static_responses(collated_manifests: Dict[str, Any],
+                          package_index: Dict[str, Any]) -> Iterator[Tuple[Tuple[str, ...], Dict[str, Any]]]:
+    """
+    Yield (path segments, response body) for every cacheable API route.
+    The last segment is the file name without its .json suffix.
+    """
+    languages = build_languages(collated_manifests)
+    if languages is not None:
+        yield ("api", "languages"), languages
+
+        for language in languages["languages"]:
+            if not is_safe_segment(language):
+                continue
+            kernels = build_kernels_for_language(collated_manifests, language)
+            if kernels is not None:
+                yield ("api", "kernels", language), kernels
+
+    seen_kernels = set()
+    for kernel in collated_manifests.get("kernels", []):
+        key = (kernel.get("language"), kernel.get("kernel_name"), kernel.get("kernel_version"))
+        # The API returns the first matching entry, so later duplicates are skipped
+        if key in seen_kernels or not all(is_safe_segment(part) for part in key):
+            continue
+        seen_kernels.add(key)
+        yield ("api", "kernel") + key, build_kernel_details(kernel)
+        yield ("api", "manifest") + key, build_kernel_manifest(kernel)
+
+    seen_packages = set()
+    for package in package_index.get("packages", []):
+        name = package.get("name")
+        if name in seen_packages or not is_safe_segment(name):
+            continue
+        seen_packages.add(name)
+        yield ("api", "package", name), build_package_info(package)
+
+    yield ("api", "packages", "search", SEARCH_ALL_SHARD), build_package_search(package_index, "")
+    for query in iter_search_shards(package_index):
+        search = build_package_search(package_index, query)
+        if search["total_matches"] <= MAX_SEARCH_SHARD_MATCHES:
+            yield ("api", "packages", "search", query), search
+
+
+def source_fingerprint(*paths: str) -> str:
+    """
+    Fingerprint the source data files by name, size and modification time.
+    Used as the release directory name so an unchanged source is not re-exported.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def write_release(release_dir: Path,
+                  collated_manifests: Dict[str, Any],
+                  package_index: Dict[str, Any]) -> int:
+    """
+    Render every cacheable response into release_dir, each with a .gz sibling.
+    Returns the number of responses written.
+    """
+    count = 0
+    for segments, content in iter_static_responses(collated_manifests, package_index):
+        target = release_dir.joinpath(*segments[:-1], segments[-1] + ".json")
+        target.parent.mkdir(parents=True, exist_ok=True)
+        body = render_json(content)
+        target.write_bytes(body)
+        Path(str(target) + ".gz").write_bytes(gzip.compress(body, compresslevel=9, mtime=0))
+        count += 1
+    return count
+
+
+def flip_current(output_root: Path, release_name: str) -> None:
+    """
+    Atomically point output_root/current at releases/<release_name>.
+    """
+    tmp_link = output_root / f".{CURRENT_LINK}.{os.getpid()}"
+    if tmp_link.is_symlink() or tmp_link.exists():
+        tmp_link.unlink()
+    os.symlink(os.path.join(RELEASES_DIR, release_name), tmp_link)
+    os.replace(tmp_link, output_root / CURRENT_LINK)
+
+
+def current_release(output_root: Path) -> Optional[str]:
+    """
+    Return the release name the current symlink points to, or None.
+    """
+    link = output_root / CURRENT_LINK
+    if not link.is_symlink():
+        return None
+    return os.path.basename(os.readlink(link))
+
+
+def prune_releases(output_root: Path, keep: int) -> None:
+    """
+    Remove all but the newest `keep` releases, never removing the current one.
+    """
+    releases_root = output_root / RELEASES_DIR
+    current = current_release(output_root)
+    releases = sorted(
+        (p for p in releases_root.iterdir() if p.is_dir() and not p.name.startswith(".")),
+        key=lambda p: p.stat().st_mtime,
+        reverse=True
+    )
+    for release in releases[max(keep, 1):]:
+        if release.name != current:
+            shutil.rmtree(release, ignore_errors=True)
+
+
+def export_static_api(output_root: str,
+                      collated_manifests: Dict[str, Any],
+                      package_index: Dict[str, Any],
+                      release_name: str,
+                      keep_releases: int = DEFAULT_KEEP_RELEASES) -> bool:
+    """
+    Export the static API tree for already-loaded data and flip it into place.
+    Concurrent exporters (uvicorn workers, the indexer) are serialized with a lock
+    file; if the current release already has release_name the export is skipped.
+    Returns True if a new release was written, False if it was already current.
+    """
+    root = Path(output_root)
+    (root / RELEASES_DIR).mkdir(parents=True, exist_ok=True)
+
+    with open(root / LOCK_FILE, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if current_release(root) == release_name and (root / RELEASES_DIR / release_name).is_dir():
+                return False
+
+            staging_dir = root / RELEASES_DIR / f".{release_name}.{os.getpid()}"
+            release_dir = root / RELEASES_DIR / release_name
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            try:
+                count = write_release(staging_dir, collated_manifests, package_index)
+                shutil.rmtree(release_dir, ignore_errors=True)
+                os.rename(staging_dir, release_dir)
+            except Exception:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+                raise
+
+            flip_current(root, release_name)
+            prune_releases(root, keep_releases)
+            print(f"Static API exported: {count} responses -> {release_dir}")
+            return True
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def load_json_file(path: str, required_field: str) -> Dict[str, Any]:
+    """
+    Load a collated JSON file and check that required_field is a list.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if required_field not in data or not isinstance(data[required_field], list):
+        raise ValueError(f"Invalid format in {path}: missing or invalid '{required_field}' field")
+    return data
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export the ICRN Kernel Manager API as a static file tree for nginx.")
+    parser.add_argument("--collated-manifests", required=True, help="Path to collated_manifests.json")
+    parser.add_argument("--package-index", required=True, help="Path to package_index.json")
+    parser.add_argument("--output-root", required=True, help="Directory holding releases/ and the current symlink")
+    parser.add_argument("--keep-releases", type=int, default=DEFAULT_KEEP_RELEASES,
+                        help=f"Number of releases to keep on disk (default: {DEFAULT_KEEP_RELEASES})")
+    args = parser.parse_args(argv)
+
+    try:
+        collated_manifests = load_json_file(args.collated_manifests, "kernels")
+        package_index = load_json_file(args.package_index, "packages")
+        release_name = source_fingerprint(args.collated_manifests, args.package_index)
+        if not export_static_api(args.output_root, collated_manifests, package_index, release_name,
+                                 keep_releases=args.keep_releases):
+            print(f"Static API already current: {release_name}")
+    except (OSError, ValueError) as e:
+        print(f"ERROR: Static API export failed: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,324 @@
+"""
+Tests for static_export.py: the exported tree must match what kernel_service.py
+serves, and nginx.conf must route requests to it (run only if nginx is installed).
+
+Run from the repository root:  python -m pytest -q web/
+"""
+import gzip
+import http.client
+import importlib
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import quote
+
+import pytest
+
+WEB_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(WEB_DIR))
+
+import static_export  # noqa: E402
+from static_export import (  # noqa: E402
+    CURRENT_LINK,
+    RELEASES_DIR,
+    SEARCH_ALL_SHARD,
+    export_static_api,
+    is_safe_segment,
+    iter_search_shards,
+    prune_releases,
+)
+
+EXAMPLES_DIR = WEB_DIR / "examples"
+COLLATED_MANIFESTS_PATH = EXAMPLES_DIR / "collated_manifests.json"
+PACKAGE_INDEX_PATH = EXAMPLES_DIR / "package_index.json"
+NGINX_CONF_PATH = WEB_DIR / "nginx.conf"
+WEB_DEPLOYMENT_PATH = WEB_DIR.parent / "kubernetes" / "02-web-deployment.yaml"
+
+
+def load_examples():
+    with open(COLLATED_MANIFESTS_PATH, 'r', encoding='utf-8') as f:
+        collated_manifests = json.load(f)
+    with open(PACKAGE_INDEX_PATH, 'r', encoding='utf-8') as f:
+        package_index = json.load(f)
+    return collated_manifests, package_index
+
+
+@pytest.fixture
+def examples_export(tmp_path):
+    collated_manifests, package_index = load_examples()
+    export_static_api(str(tmp_path), collated_manifests, package_index, "release1")
+    return tmp_path / CURRENT_LINK
+
+
+def test_exported_files_match_kernel_service(examples_export, monkeypatch):
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+    pytest.importorskip("uvicorn")
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setenv("COLLATED_MANIFESTS_PATH", str(COLLATED_MANIFESTS_PATH))
+    monkeypatch.setenv("PACKAGE_INDEX_PATH", str(PACKAGE_INDEX_PATH))
+    monkeypatch.setenv("STATIC_API_ROOT", "")
+    kernel_service = importlib.import_module("kernel_service")
+    kernel_service.load_data_files()
+    # Not used as a context manager, so the startup event (and its reload thread) does not run
+    client = TestClient(kernel_service.app)
+
+    api_dir = examples_export / "api"
+    search_dir = api_dir / "packages" / "search"
+    exported = sorted(api_dir.rglob("*.json"))
+    assert exported
+    for path in exported:
+        if path.parent == search_dir:
+            query = "" if path.stem == SEARCH_ALL_SHARD else path.stem
+            url = "/api/packages/search?query=" + quote(query, safe="")
+        else:
+            parts = path.relative_to(api_dir).with_suffix("").parts
+            url = "/api/" + "/".join(quote(part, safe="") for part in parts)
+        response = client.get(url)
+        body = path.read_bytes()
+        assert response.status_code == 200, url
+        assert response.content == body, url
+        assert gzip.decompress(Path(str(path) + ".gz").read_bytes()) == body, url
+
+
+@pytest.mark.parametrize("segment", ["", ".", "..", ".hidden", "a/b", "a\\b", "a\0b", None, 1])
+def test_is_safe_segment_rejects_unsafe_names(segment):
+    assert not is_safe_segment(segment)
+
+
+@pytest.mark.parametrize("segment", ["R", "Python", "1.91", "astropy-base", "_libgcc_mutex"])
+def test_is_safe_segment_accepts_names(segment):
+    assert is_safe_segment(segment)
+
+
+def test_export_with_same_fingerprint_is_skipped(tmp_path):
+    collated_manifests, package_index = load_examples()
+    assert export_static_api(str(tmp_path), collated_manifests, package_index, "release1")
+    marker = tmp_path / RELEASES_DIR / "release1" / "marker"
+    marker.write_text("kept")
+
+    assert not export_static_api(str(tmp_path), collated_manifests, package_index, "release1")
+    assert marker.exists()
+    assert os.readlink(tmp_path / CURRENT_LINK) == os.path.join(RELEASES_DIR, "release1")
+
+
+def test_export_flips_current_and_prunes_old_releases(tmp_path):
+    collated_manifests, package_index = load_examples()
+    for name in ("release1", "release2", "release3"):
+        assert export_static_api(str(tmp_path), collated_manifests, package_index, name, keep_releases=2)
+        os.utime(tmp_path / RELEASES_DIR / name)
+
+    assert os.readlink(tmp_path / CURRENT_LINK) == os.path.join(RELEASES_DIR, "release3")
+    assert sorted(p.name for p in (tmp_path / RELEASES_DIR).iterdir()) == ["release2", "release3"]
+
+
+def test_prune_releases_keeps_current(tmp_path):
+    releases = tmp_path / RELEASES_DIR
+    for i, name in enumerate(("old", "newer", "newest")):
+        (releases / name).mkdir(parents=True)
+        os.utime(releases / name, (1000 + i, 1000 + i))
+    os.symlink(os.path.join(RELEASES_DIR, "old"), tmp_path / CURRENT_LINK)
+
+    prune_releases(tmp_path, keep=1)
+
+    assert sorted(p.name for p in releases.iterdir()) == ["newest", "old"]
+
+
+def test_search_shards_are_package_name_prefixes():
+    package_index = {"packages": [{"name": "NumPy"}, {"name": "r-base"}, {"name": "a+b"}, {"name": ".hidden"}]}
+    shards = list(iter_search_shards(package_index))
+
+    assert shards == sorted(set(shards))
+    assert {"n", "nu", "num", "nump", "numpy", "r", "r-", "r-b", "r-ba", "r-bas", "r-base", "a"} == set(shards)
+    assert SEARCH_ALL_SHARD not in shards
+
+
+def test_empty_query_shard_cannot_be_overwritten(tmp_path):
+    package_index = {"packages": [{"name": "read_all"}, {"name": "@all"}, {"name": "zzz"}]}
+    export_static_api(str(tmp_path), {"kernels": []}, package_index, "release1")
+
+    all_shard = tmp_path / CURRENT_LINK / "api" / "packages" / "search" / (SEARCH_ALL_SHARD + ".json")
+    content = json.loads(all_shard.read_text())
+    assert content["query"] == ""
+    assert content["total_matches"] == 3
+
+
+def test_broad_search_shards_are_left_to_fastapi(tmp_path):
+    packages = [{"name": f"pkg{i}"} for i in range(static_export.MAX_SEARCH_SHARD_MATCHES + 1)]
+    export_static_api(str(tmp_path), {"kernels": []}, {"packages": packages}, "release1")
+
+    search_dir = tmp_path / CURRENT_LINK / "api" / "packages" / "search"
+    assert not (search_dir / "pkg.json").exists()
+    assert (search_dir / "pkg9.json").exists()
+
+
+def test_kubernetes_nginx_configmap_matches_nginx_conf():
+    yaml = pytest.importorskip("yaml")
+    with open(WEB_DEPLOYMENT_PATH, 'r', encoding='utf-8') as f:
+        docs = [doc for doc in yaml.safe_load_all(f) if doc]
+    configmap = next(doc for doc in docs if doc["kind"] == "ConfigMap" and doc["metadata"]["name"] == "icrn-web-nginx")
+
+    def normalize(text):
+        return [line.rstrip() for line in text.strip("\n").splitlines()]
+
+    assert normalize(configmap["data"]["nginx.conf"]) == normalize(NGINX_CONF_PATH.read_text())
+
+
+# ---------------------------------------------------------------------------
+# nginx routing (skipped unless an nginx binary is on PATH)
+# ---------------------------------------------------------------------------
+
+class BackendHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for FastAPI: marks every response so tests can tell it from the static tree.
+    """
+    def _respond(self):
+        body = json.dumps({"backend": self.path}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("X-Backend", "1")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _respond
+    do_POST = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def replace_once(text, old, new):
+    assert old in text, f"nginx.conf no longer contains {old!r}"
+    return text.replace(old, new)
+
+
+@pytest.fixture
+def nginx_server(tmp_path, examples_export):
+    """
+    Run nginx.conf against the exported example tree and a stand-in backend.
+    Yields a function (method, path, headers) -> (status, headers, body).
+    """
+    nginx = shutil.which("nginx")
+    if nginx is None:
+        pytest.skip("nginx is not installed")
+
+    backend = ThreadingHTTPServer(("127.0.0.1", 0), BackendHandler)
+    threading.Thread(target=backend.serve_forever, daemon=True).start()
+    port = free_port()
+
+    run_dir = tmp_path / "nginx"
+    run_dir.mkdir()
+    conf = NGINX_CONF_PATH.read_text()
+    conf = replace_once(conf, "include       /etc/nginx/mime.types;", "types { application/json json; }")
+    conf = replace_once(conf, "/var/log/nginx/", f"{run_dir}/")
+    conf = replace_once(conf, "server 127.0.0.1:8000;", f"server 127.0.0.1:{backend.server_address[1]};")
+    conf = replace_once(conf, "listen 80;", f"listen 127.0.0.1:{port};")
+    conf = replace_once(conf, "/app/static_api/current", str(examples_export))
+    conf = replace_once(conf, "root /app/static;", f"root {run_dir}/static;")
+    conf = replace_once(conf, "root /app;", f"root {run_dir};")
+    temp_paths = "".join(
+        f"    {directive} {run_dir}/{directive};\n"
+        for directive in ("client_body_temp_path", "proxy_temp_path", "fastcgi_temp_path", "uwsgi_temp_path", "scgi_temp_path")
+    )
+    conf = replace_once(conf, "http {\n", "http {\n" + temp_paths)
+    conf_path = run_dir / "nginx.conf"
+    conf_path.write_text(conf)
+
+    globals_ = f"pid {run_dir}/nginx.pid; error_log {run_dir}/error.log;"
+    if os.geteuid() == 0:
+        globals_ += " user root;"
+    command = [nginx, "-p", str(run_dir), "-c", str(conf_path)]
+    check = subprocess.run(command + ["-g", globals_, "-t"], capture_output=True, text=True)
+    assert check.returncode == 0, check.stderr
+
+    process = subprocess.Popen(command + ["-g", globals_ + " daemon off;"])
+    try:
+        deadline = time.time() + 10
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                assert process.poll() is None and time.time() < deadline, "nginx did not start"
+                time.sleep(0.1)
+
+        def request(method, path, headers=None):
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+            try:
+                connection.request(method, path, headers=headers or {})
+                response = connection.getresponse()
+                return response.status, response.headers, response.read()
+            finally:
+                connection.close()
+
+        yield request
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+        backend.shutdown()
+
+
+def test_nginx_serves_exported_routes_from_static_tree(nginx_server, examples_export):
+    api_dir = examples_export / "api"
+    package = "BayesianTools"
+    cases = {
+        "/api/languages": api_dir / "languages.json",
+        "/api/kernels/R": api_dir / "kernels" / "R.json",
+        "/api/kernel/R/pecan/1.91": api_dir / "kernel" / "R" / "pecan" / "1.91.json",
+        "/api/manifest/R/pecan/1.91": api_dir / "manifest" / "R" / "pecan" / "1.91.json",
+        f"/api/package/{package}": api_dir / "package" / f"{package}.json",
+        "/api/packages/search?query=numpy": api_dir / "packages" / "search" / "numpy.json",
+        "/api/packages/search?query=": api_dir / "packages" / "search" / f"{SEARCH_ALL_SHARD}.json",
+        "/api/packages/search": api_dir / "packages" / "search" / f"{SEARCH_ALL_SHARD}.json",
+    }
+    for url, path in cases.items():
+        assert path.exists(), path
+        status, headers, body = nginx_server("GET", url)
+        assert status == 200, url
+        assert headers.get("X-Backend") is None, url
+        assert headers.get("Content-Type", "").startswith("application/json"), url
+        assert body == path.read_bytes(), url
+
+    status, headers, body = nginx_server("GET", "/api/languages", {"Accept-Encoding": "gzip"})
+    assert status == 200
+    assert headers.get("Content-Encoding") == "gzip"
+    assert body == (api_dir / "languages.json.gz").read_bytes()
+
+
+@pytest.mark.parametrize("method, url", [
+    ("GET", "/api/package/no-such-package"),
+    ("GET", "/api/languages.json"),
+    ("GET", "/api/packages/search?query=NumPy"),
+    ("GET", "/api/packages/search?QUERY=numpy"),
+    ("GET", "/api/packages/search?query=numpy&query=scipy"),
+    ("GET", "/api/packages/search?query=no-such-package-prefix"),
+    ("GET", "/api/packages/search?query=num%70y"),
+    ("GET", "/"),
+    ("POST", "/api/refresh"),
+])
+def test_nginx_falls_back_to_backend(nginx_server, method, url):
+    status, headers, _ = nginx_server(method, url)
+    assert status == 200, url
+    assert headers.get("X-Backend") == "1", url
+
+
+@pytest.mark.parametrize("url", ["/api/packages/search/numpy", f"/api/packages/search/{SEARCH_ALL_SHARD}"])
+def test_nginx_does_not_expose_search_shard_files(nginx_server, url):
+    status, headers, _ = nginx_server("GET", url)
+    assert status == 404
+    assert headers.get("X-Backend") is None